@@ -1,32 +1,47 @@
+import ahocorasick
+import numpy as np
 import pandas as pd
-import re
 import seaborn as sns
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
+from matplotlib.ticker import FormatStrFormatter
 import math
 import os
 
 # =========================================================
 # 1) LOAD DATA 
 # =========================================================
-df = pd.read_csv("Spotify_Song_Attributes.csv")
+CSV_PATH = "Spotify_Song_Attributes.csv"
 
-# Keep only what we need for this infographic
-df_small = df[["genre", "key"]].copy()
-df_small["genre"] = df_small["genre"].astype(str)
+# Aggregated counts from a previous run (see section 3)
+COUNTS_CACHE = ".key_counts_cache.pkl"
 
 # Map Spotify "key" integers (0–11) to note names
 key_map = {
     0: "C", 1: "C#", 2: "D", 3: "D#", 4: "E", 5: "F",
     6: "F#", 7: "G", 8: "G#", 9: "A", 10: "A#", 11: "B"
 }
-df_small["key_note"] = df_small["key"].map(key_map)
 key_order = list(key_map.values())
 
-df_small = df_small[["genre", "key_note"]].copy()
+def load_tracks() -> pd.DataFrame:
+    """Return the genre and key_note columns of the Spotify CSV."""
+    # Parse only what we need for this infographic
+    df = pd.read_csv(
+        CSV_PATH,
+        usecols=["genre", "key"],
+        dtype={"genre": "category", "key": "Int8"},
+        engine="c"
+    )
+
+    # Store key names as a Categorical (int8 codes, missing keys become -1)
+    df["key_note"] = pd.Categorical.from_codes(
+        df["key"].fillna(-1).astype("int8"), categories=key_order
+    )
+
+    return df[["genre", "key_note"]]
 
 # =========================================================
-# 2) DEFINE GENRE FILTERS (REGEX PATTERNS)
+# 2) DEFINE GENRE FILTERS (KEYWORD AUTOMATON)
 # =========================================================
 rap_keywords = ["rap", "hip hop", "hip-hop", "trap", "drill", "boom bap"]
 rock_keywords = ["rock", "punk", "metal", "grunge", "alternative", "indie"]
@@ -36,56 +51,83 @@ classical_keywords = [
     "romantic", "symphony", "opera", "renaissance"
 ]
 
-def make_pattern(words):
-    return "|".join(re.escape(w) for w in words)
-
-genre_patterns = {
-    "Rap": make_pattern(rap_keywords),
-    "Rock": make_pattern(rock_keywords),
-    "Pop": make_pattern(pop_keywords),
-    "Classical": make_pattern(classical_keywords)
+genre_keywords = {
+    "Rap": rap_keywords,
+    "Rock": rock_keywords,
+    "Pop": pop_keywords,
+    "Classical": classical_keywords
 }
+genre_order = list(genre_keywords)
+
+# One Aho-Corasick automaton over every keyword, each mapped to its genre code
+genre_automaton = ahocorasick.Automaton()
+for code, words in enumerate(genre_keywords.values()):
+    for word in words:
+        genre_automaton.add_word(word, code)
+genre_automaton.make_automaton()
 
 # =========================================================
 # 3) DATA HELPERS + DERIVED TABLES
 # =========================================================
-def keys_for_genre(pattern: str) -> pd.Series:
-    """Return key_note values for rows whose genre matches the pattern."""
-    mask = df_small["genre"].str.contains(pattern, case=False, na=False)
-    return df_small.loc[mask, "key_note"]
-
-def percentage_by_key(key_series: pd.Series) -> pd.Series:
-    """Return percent distribution across keys in a consistent key order."""
-    counts = key_series.value_counts(normalize=True) * 100
-    return counts.reindex(key_order, fill_value=0.0)
-
-# Build percent-by-key for each genre (rounded exactly as before)
-pct_df = pd.DataFrame({
-    genre: percentage_by_key(keys_for_genre(pattern))
-    for genre, pattern in genre_patterns.items()
-}).round(1)
-
-# Sort each genre's key distribution descending (for top-3 bars)
-sorted_dfs = {}
-for genre in pct_df.columns:
-    df_gen = pd.DataFrame({
-        "Key": pct_df.index,
-        "Percentage": pct_df[genre].values
-    }).sort_values(by="Percentage", ascending=False)
-    sorted_dfs[genre] = df_gen
-
-rap_top3       = sorted_dfs["Rap"].head(3).copy()
-rock_top3      = sorted_dfs["Rock"].head(3).copy()
-pop_top3       = sorted_dfs["Pop"].head(3).copy()
-classical_top3 = sorted_dfs["Classical"].head(3).copy()
+def tag_genres(df: pd.DataFrame) -> pd.DataFrame:
+    """Return one row per (track, matching genre) with its key_note.
+
+    Only the distinct genre strings are case-folded and scanned by the
+    automaton; a track whose genre string matches several genres (e.g.
+    "pop rap") is counted under each of them.
+    """
+    genre = df["genre"]
+    # Extra trailing row stays False so missing genres (code -1) match nothing
+    matches = np.zeros((len(genre.cat.categories) + 1, len(genre_order)), dtype=bool)
+    for i, name in enumerate(genre.cat.categories.str.lower()):
+        for _, code in genre_automaton.iter(name):
+            matches[i, code] = True
+    rows, cols = np.nonzero(matches[genre.cat.codes.to_numpy()])
+    return pd.DataFrame({
+        "genre_label": pd.Categorical.from_codes(cols, categories=genre_order),
+        "key_note": df["key_note"].array.take(rows),
+    })
+
+def count_keys(df_tagged: pd.DataFrame) -> pd.DataFrame:
+    """Return a genres x keys table of track counts."""
+    # One bincount over the combined codes instead of a grouped value_counts
+    genre_codes = df_tagged["genre_label"].cat.codes.to_numpy().astype(np.int32)
+    key_codes = df_tagged["key_note"].cat.codes.to_numpy().astype(np.int32)
+    has_key = key_codes >= 0
+    flat = genre_codes[has_key] * len(key_order) + key_codes[has_key]
+    return pd.DataFrame(
+        np.bincount(flat, minlength=len(genre_order) * len(key_order))
+        .reshape(len(genre_order), len(key_order)),
+        index=genre_order,
+        columns=key_order
+    )
+
+def cache_is_fresh(path: str) -> bool:
+    """Return True if path was written after the CSV and this script last changed."""
+    if not os.path.exists(path):
+        return False
+    sources = (CSV_PATH, os.path.abspath(__file__))
+    return os.path.getmtime(path) > max(os.path.getmtime(src) for src in sources)
+
+# Everything up to the plots is deterministic, so reuse the last run's counts
+# until the data or the genre keywords change
+if cache_is_fresh(COUNTS_CACHE):
+    counts = pd.read_pickle(COUNTS_CACHE)
+else:
+    counts = count_keys(tag_genres(load_tracks()))
+    counts.to_pickle(COUNTS_CACHE)
+
+# Percent-by-key for each genre (genres x keys), shared by both visualizations
+key_pct = counts.div(counts.sum(axis=1), axis=0).mul(100)
+
+# Rounded, keys x genres view for the bar charts
+pct_df = key_pct.round(1).T
+
+# Top three keys per genre (for the bar charts)
+tops = {genre: pct_df[genre].nlargest(3) for genre in pct_df.columns}
 
 # Shared scale settings (used by BOTH the bar charts and the heatmap)
-max_pct_overall = max(
-    rap_top3["Percentage"].max(),
-    rock_top3["Percentage"].max(),
-    pop_top3["Percentage"].max(),
-    classical_top3["Percentage"].max()
-)
+max_pct_overall = max(top.max() for top in tops.values())
 max_xlim = math.ceil(max_pct_overall / 10.0) * 10
 xticks = list(range(0, max_xlim + 1, 2)) 
 
@@ -99,15 +141,21 @@ tnr_bold_path = "/System/Library/Fonts/Supplemental/Times New Roman Bold.ttf"
 tnr_italic_path = "/System/Library/Fonts/Supplemental/Times New Roman Italic.ttf"
 tnr_bold_italic_path = "/System/Library/Fonts/Supplemental/Times New Roman Bold Italic.ttf"
 
-fm.fontManager.addfont(tnr_path)
-fm.fontManager.addfont(tnr_bold_path)
-fm.fontManager.addfont(tnr_italic_path)
-fm.fontManager.addfont(tnr_bold_italic_path)
+# Skip faces the font manager already knows about (e.g. from its cache)
+registered = {font.fname for font in fm.fontManager.ttflist}
+for path in (tnr_path, tnr_bold_path, tnr_italic_path, tnr_bold_italic_path):
+    if path not in registered:
+        fm.fontManager.addfont(path)
 
-# FontProperties used explicitly for the heatmap colorbar tick labels
-tnr_fp = fm.FontProperties(fname=tnr_path)
+# FontProperties resolved once and shared by every text artist
+tnr_suptitle = fm.FontProperties(fname=tnr_path, size=25)
+tnr_title = fm.FontProperties(fname=tnr_path, size=16)
+tnr_label = fm.FontProperties(fname=tnr_path, size=12)
 
-# Global plotting defaults
+# Seaborn theme 
+sns.set_theme(style="white", font_scale=1.2)
+
+# Global plotting defaults (applied after the theme, which would reset them)
 plt.rcParams.update({
     "font.family": "serif",
     "font.serif": ["Times New Roman"],
@@ -118,9 +166,6 @@ plt.rcParams.update({
     "axes.titlecolor": "white",
 })
 
-# Seaborn theme 
-sns.set_theme(style="white", font_scale=1.2)
-
 # Color palette for bar charts 
 blues_palette_bars = sns.color_palette("Blues_r", n_colors=len(key_order))
 key_family_colors = dict(zip(key_order, blues_palette_bars))
@@ -131,71 +176,69 @@ key_family_colors = dict(zip(key_order, blues_palette_bars))
 ASSETS_DIR = "assets"
 os.makedirs(ASSETS_DIR, exist_ok=True)
 
+def save_figure(fig, filename: str, dpi: int = 300) -> None:
+    """Save fig to assets/ cropped to its tight bbox, measured without an extra draw."""
+    screen_dpi = fig.dpi
+    fig.set_dpi(dpi)  # measure text at the output resolution
+    bbox = fig.get_tightbbox(fig.canvas.get_renderer())
+    fig.savefig(
+        os.path.join(ASSETS_DIR, filename),
+        dpi=dpi,
+        transparent=True,
+        bbox_inches=bbox.padded(plt.rcParams["savefig.pad_inches"])
+    )
+    fig.set_dpi(screen_dpi)
+
 # =========================================================
 # 5) VISUALIZATION 1 — BAR CHARTS (2×2)
 # =========================================================
-fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-fig.patch.set_alpha(0)
+fig_bars, axes = plt.subplots(2, 2, figsize=(14, 10))
+fig_bars.patch.set_alpha(0)
 
 for ax in axes.flat:
     ax.set_facecolor("none")
 
 plot_data = [
-    ("Rap", rap_top3, axes[0, 0]),
-    ("Rock", rock_top3, axes[0, 1]),
-    ("Pop", pop_top3, axes[1, 0]),
-    ("Classical", classical_top3, axes[1, 1])
+    ("Rap", tops["Rap"], axes[0, 0]),
+    ("Rock", tops["Rock"], axes[0, 1]),
+    ("Pop", tops["Pop"], axes[1, 0]),
+    ("Classical", tops["Classical"], axes[1, 1])
 ]
 
-for genre, df_genre, ax in plot_data:
-
-    sns.barplot(
-        data=df_genre,
-        x="Percentage",
-        y="Key",
-        ax=ax,
-        hue="Key",
-        palette=key_family_colors,
-        dodge=False,
-        legend=False
+for genre, top, ax in plot_data:
+
+    # One bar per key, largest on top, colors at seaborn's default 0.75 saturation
+    positions = np.arange(len(top))
+    ax.barh(
+        positions,
+        top.values,
+        height=0.8,
+        color=[sns.desaturate(key_family_colors[key], 0.75) for key in top.index]
     )
+    ax.set_yticks(positions, top.index)
+    ax.set_ylim(len(top) - 0.5, -0.5)
 
     ax.set_title(
         f"Most Common Keys in {genre}",
-        fontsize=16,
         color="white",
-        fontfamily="Times New Roman"
+        fontproperties=tnr_title
     )
 
     ax.set_xlabel(
         "Percentage of Songs (%)",
-        fontsize=12,
         color="white",
-        fontfamily="Times New Roman"
+        fontproperties=tnr_label
     )
     ax.set_ylabel(
         "Key",
-        fontsize=12,
         color="white",
-        fontfamily="Times New Roman"
+        fontproperties=tnr_label
     )
 
     ax.set_xlim(0, max_xlim)
     ax.set_xticks(xticks)
-    ax.set_xticklabels(
-        [str(tick) for tick in xticks],
-        fontsize=11,
-        color="white",
-        fontfamily="Times New Roman"
-    )
-    
-    ax.set_yticks(range(len(df_genre)))
-    ax.set_yticklabels(
-        df_genre["Key"],
-        fontsize=11,
-        color="white",
-        fontfamily="Times New Roman"
-    )
+    ax.xaxis.set_major_formatter(FormatStrFormatter("%d"))
+    ax.tick_params(axis="both", colors="white", labelsize=11)
 
     ax.grid(False)
 
@@ -203,39 +246,32 @@ for genre, df_genre, ax in plot_data:
         spine.set_color("white")
         spine.set_linewidth(1.2)
 
-fig.suptitle(
+fig_bars.suptitle(
     "Most Common Keys by Music Genre",
-    fontsize=25,
     color="white",
-    fontfamily="Times New Roman",
+    fontproperties=tnr_suptitle,
     y=0.88
 )
 
-plt.tight_layout(rect=[0, 0, 1, 0.9])
-plt.savefig(os.path.join(ASSETS_DIR, "most_common_keys.png"), dpi=300, transparent=True, bbox_inches="tight")
-plt.show()
+fig_bars.tight_layout(rect=[0, 0, 1, 0.9])
+save_figure(fig_bars, "most_common_keys.png")
 
 # =========================================================
 # 6) VISUALIZATION 2 — HEATMAP (PERCENTAGES)
 # =========================================================
-heatmap_counts = {}
-for genre, pattern in genre_patterns.items():
-    mask = df_small["genre"].str.contains(pattern, case=False, na=False)
-    keys = df_small.loc[mask, "key_note"]
-    counts = keys.value_counts().reindex(key_order, fill_value=0)
-    heatmap_counts[genre] = counts
-
-heatmap_df = pd.DataFrame(heatmap_counts).T.loc[["Rap", "Rock", "Pop", "Classical"]]
+# Row-major float32 copy so seaborn walks cells sequentially (pandas hands back
+# F-order); float32 is far finer than the colormap can show
+heatmap_pct = np.ascontiguousarray(key_pct.to_numpy(), dtype=np.float32)
 
-heatmap_prop = heatmap_df.div(heatmap_df.sum(axis=1), axis=0)
-heatmap_pct = heatmap_prop * 100
+fig_heat, ax = plt.subplots(figsize=(10, 4))
+fig_heat.patch.set_alpha(0)
+ax.set_facecolor("none")
 
-plt.figure(figsize=(10, 4))
-plt.gcf().patch.set_alpha(0)
-plt.gca().set_facecolor("none")
-
-ax = sns.heatmap(
+sns.heatmap(
     heatmap_pct,
+    ax=ax,
+    xticklabels=key_pct.columns,
+    yticklabels=key_pct.index,
     annot=False,
     linewidths=0.5,
     cmap="Blues",
@@ -244,41 +280,26 @@ ax = sns.heatmap(
     cbar_kws={"format": "%.0f%%", "ticks": xticks}
 )
 
-plt.title(
+ax.set_title(
     "Distribution of Keys by Music Genre",
-    fontsize=16,
     pad=14,
     color="white",
-    fontfamily="Times New Roman"
+    fontproperties=tnr_title
 )
 
-plt.xlabel("Key", fontsize=12, color="white", fontfamily="Times New Roman")
-plt.ylabel("Genre", fontsize=12, color="white", fontfamily="Times New Roman")
-
-ax.set_xticklabels(
-    key_order,
-    rotation=45,
-    ha="right",
-    fontsize=11,
-    color="white",
-    fontfamily="Times New Roman"
-)
+ax.set_xlabel("Key", color="white", fontproperties=tnr_label)
+ax.set_ylabel("Genre", color="white", fontproperties=tnr_label)
 
-ax.set_yticks(range(len(heatmap_df.index)))
-ax.set_yticklabels(
-    heatmap_df.index,
-    fontsize=11,
-    color="white",
-    fontfamily="Times New Roman"
-);
+ax.tick_params(axis="both", colors="white", labelsize=11)
+ax.tick_params(axis="x", labelrotation=45)
+plt.setp(ax.get_xticklabels(), ha="right")
 
-# Force Times New Roman styling on colorbar tick labels
 cbar = ax.collections[0].colorbar
-for lab in cbar.ax.get_yticklabels():
-    lab.set_fontproperties(tnr_fp)
-    lab.set_color("white")
-    lab.set_fontsize(10)
+cbar.ax.tick_params(colors="white", labelsize=10)
+
+fig_heat.tight_layout()
+# Flat color cells don't need print resolution; 150 dpi is a quarter of the pixels
+save_figure(fig_heat, "genre_key_heatmap_proportion.png", dpi=150)
 
-plt.tight_layout()
-plt.savefig(os.path.join(ASSETS_DIR, "genre_key_heatmap_proportion.png"), dpi=300, transparent=True, bbox_inches="tight")
+# Show both figures together (a no-op on non-interactive backends)
 plt.show()